@@ -15,6 +15,7 @@ class LiteConfig:
         self.load_config()  # 尝试加载配置文件
         # 重新加载环境变量以确保优先级
         self._load_env_overrides()
+        self._refresh_openai_cache()
 
     def _load_default_config(self):
         """加载默认配置"""
@@ -47,6 +48,20 @@ class LiteConfig:
             self.config['openai']['api_key'] = api_key
         if base_url is not None:
             self.config['openai']['base_url'] = base_url
+        self._refresh_openai_cache()
+
+    def update_config(self, new_config):
+        """深度合并新配置，OpenAI相关的缓存随之刷新"""
+        self._deep_merge(self.config, new_config)
+        self._refresh_openai_cache()
+
+    def _refresh_openai_cache(self):
+        """预先计算上游地址和认证头，请求路径上直接读取，无需每次拼接"""
+        openai_config = self.config['openai']
+        self.openai_base_url = openai_config['base_url'].rstrip('/')
+        self.chat_completions_url = f"{self.openai_base_url}/chat/completions"
+        self.models_url = f"{self.openai_base_url}/models"
+        self.auth_header = f"Bearer {openai_config['api_key']}"
 
     def update_server_config(self, host=None, port=None, debug=None):
         """更新服务器配置"""
@@ -7,15 +7,40 @@ import json
 import logging
 import uuid
 import re
+import os
+import itertools
 
 # 设置极简日志 - 只记录错误
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# 消息ID仅用于客户端标识，无需加密随机数：启动时随机前缀 + 进程内递增计数
+_ID_PREFIX = os.urandom(4).hex()
+_ID_COUNTER = itertools.count()
+
 
 class LiteConverter:
     """轻量级转换器 - 简单、快速、透明"""
 
+    # Anthropic响应结构模板，content/usage等可变字段每次都会重新赋值
+    RESPONSE_TEMPLATE = {
+        'id': '',
+        'type': 'message',
+        'role': 'assistant',
+        'content': None,
+        'model': '',
+        'stop_reason': 'end_turn',
+        'usage': None
+    }
+
+    # OpenAI finish_reason -> Anthropic stop_reason
+    STOP_REASON_MAPPING = {
+        'stop': 'end_turn',
+        'length': 'max_tokens',
+        'tool_calls': 'tool_use',
+        'content_filter': 'stop_sequence'
+    }
+
     def __init__(self, model_mappings=None):
         self.model_mappings = model_mappings or []
 
@@ -41,15 +66,15 @@ class LiteConverter:
             # 角色映射
             openai_role = 'assistant' if role == 'assistant' else 'user'
 
-            # 处理列表内容（工具调用和工具结果）
-            if isinstance(content, list):
+            # 处理列表内容（工具调用和工具结果），精确类型比较比isinstance更快
+            if type(content) is list:
                 # 检查是否包含工具调用或工具结果
                 has_tool_calls = any(item.get('type') in ['tool_use', 'tool_result'] for item in content)
 
                 if has_tool_calls and role == 'assistant':
                     # 处理助手工具调用，转换为OpenAI格式
                     tool_calls = []
-                    text_content = ''
+                    text_parts = []
 
                     for item in content:
                         if item.get('type') == 'tool_use':
@@ -62,8 +87,9 @@ class LiteConverter:
                                 }
                             })
                         elif item.get('type') == 'text':
-                            text_content += item.get('text', '')
+                            text_parts.append(item.get('text', ''))
 
+                    text_content = ''.join(text_parts)
                     openai_message = {'role': openai_role, 'content': text_content if text_content else None}
                     if tool_calls:
                         openai_message['tool_calls'] = tool_calls
@@ -84,19 +110,15 @@ class LiteConverter:
                             openai_message['content'] = item.get('text', '')
 
                 else:
-                    # 普通文本内容处理
-                    text_content = ''
-                    for item in content:
-                        if item.get('type') == 'text':
-                            text_content += item.get('text', '')
+                    # 普通文本内容处理，join避免逐段拼接字符串
+                    text_content = ''.join(
+                        item.get('text', '') for item in content if item.get('type') == 'text'
+                    )
 
                     openai_message = {'role': openai_role, 'content': text_content}
 
-            elif isinstance(content, str):
-                # 普通字符串内容
-                openai_message = {'role': openai_role, 'content': content}
             else:
-                # 普通文本
+                # 普通字符串内容
                 openai_message = {'role': openai_role, 'content': content}
 
             openai_messages.append(openai_message)
@@ -104,33 +126,39 @@ class LiteConverter:
         return openai_messages
 
     def convert_request(self, anthropic_request):
-        """Anthropic请求格式转为OpenAI格式"""
+        """Anthropic请求格式转为OpenAI格式
+
+        只读取anthropic_request，不修改也不深拷贝；system、tool_choice、input_schema
+        按引用放入结果，同一请求字典可以重复转换
+        """
         anthropic_model = anthropic_request.get('model', 'gpt-4')
         openai_model = self.get_mapped_model(anthropic_model)
+        openai_messages = self.convert_messages(anthropic_request.get('messages', []))
 
         openai_request = {
             'model': openai_model,
             'max_tokens': anthropic_request.get('max_tokens', 1024),
-            'messages': [],
+            'messages': openai_messages,
             'temperature': anthropic_request.get('temperature', 0.7)
         }
 
+        # 快速路径：大多数请求没有系统消息和工具，直接返回
+        has_system = 'system' in anthropic_request
+        has_tools = 'tools' in anthropic_request
+        if not (has_system or has_tools or 'tool_choice' in anthropic_request):
+            return openai_request
+
         # 处理系统消息
-        if 'system' in anthropic_request:
-            openai_request['messages'].insert(0, {
+        if has_system:
+            openai_request['messages'] = [{
                 'role': 'system',
                 'content': anthropic_request['system']
-            })
-
-        # 转换消息
-        anthropic_messages = anthropic_request.get('messages', [])
-        openai_request['messages'].extend(self.convert_messages(anthropic_messages))
+            }] + openai_messages
 
         # 转换工具定义
-        if 'tools' in anthropic_request:
-            openai_tools = []
-            for tool in anthropic_request['tools']:
-                openai_tool = {
+        if has_tools:
+            openai_request['tools'] = [
+                {
                     "type": "function",
                     "function": {
                         "name": tool.get('name', ''),
@@ -138,8 +166,8 @@ class LiteConverter:
                         "parameters": tool.get('input_schema', {})
                     }
                 }
-                openai_tools.append(openai_tool)
-            openai_request['tools'] = openai_tools
+                for tool in anthropic_request['tools']
+            ]
 
         # 可选参数
         if 'tool_choice' in anthropic_request:
@@ -150,24 +178,22 @@ class LiteConverter:
     def convert_response(self, openai_response):
         """OpenAI响应格式转为Anthropic格式"""
         # 检查错误响应
-        if not openai_response.get('choices'):
+        if self._is_error_response(openai_response):
             raise Exception(f"OpenAI API error: {openai_response}")
 
         # 生成有效ID
         original_id = openai_response.get('id', '')
-        response_id = f"msg_{original_id.replace('chat-', '')}" if original_id else f"msg_{uuid.uuid4().hex[:12]}"
-
-        anthropic_response = {
-            'id': response_id,
-            'type': 'message',
-            'role': 'assistant',
-            'content': [],
-            'model': openai_response.get('model', ''),
-            'stop_reason': 'end_turn',
-            'usage': {
-                'input_tokens': openai_response.get('usage', {}).get('prompt_tokens', 0),
-                'output_tokens': openai_response.get('usage', {}).get('completion_tokens', 0)
-            }
+        response_id = f"msg_{original_id.replace('chat-', '')}" if original_id else f"msg_{_ID_PREFIX}{next(_ID_COUNTER):08x}"
+
+        # 从模板浅拷贝响应结构，只填充变化的字段
+        usage = openai_response.get('usage', {})
+        anthropic_response = self.RESPONSE_TEMPLATE.copy()
+        anthropic_response['id'] = response_id
+        anthropic_response['content'] = []
+        anthropic_response['model'] = openai_response.get('model', '')
+        anthropic_response['usage'] = {
+            'input_tokens': usage.get('prompt_tokens', 0),
+            'output_tokens': usage.get('completion_tokens', 0)
         }
 
         # 转换内容
@@ -185,7 +211,6 @@ class LiteConverter:
                     'name': function.get('name', ''),
                     'input': json.loads(function.get('arguments', '{}'))
                 })
-            anthropic_response['stop_reason'] = 'tool_use'
         else:
             # 处理文本响应（兼容reasoning_content字段）
             message_content = message.get('content') or message.get('reasoning_content', '')
@@ -202,7 +227,6 @@ class LiteConverter:
                             'name': tool['name'],
                             'input': tool['arguments']
                         })
-                    anthropic_response['stop_reason'] = 'tool_use'
                 else:
                     # 普通文本响应
                     anthropic_response['content'] = [{
@@ -210,18 +234,31 @@ class LiteConverter:
                         'text': message_content
                     }]
 
-        # 转换停止原因
-        finish_reason = choice.get('finish_reason', 'stop')
-        stop_mapping = {
-            'stop': 'end_turn',
-            'length': 'max_tokens',
-            'tool_calls': 'tool_use',
-            'content_filter': 'stop_sequence'
-        }
-        anthropic_response['stop_reason'] = stop_mapping.get(finish_reason, 'end_turn')
+        # 转换停止原因：生成了tool_use内容时（包括从文本中解析出的工具调用）固定为tool_use，
+        # 否则按finish_reason映射（tool_calls 映射为 tool_use）
+        content = anthropic_response['content']
+        if content and content[0]['type'] == 'tool_use':
+            anthropic_response['stop_reason'] = 'tool_use'
+        else:
+            finish_reason = choice.get('finish_reason', 'stop')
+            anthropic_response['stop_reason'] = self.STOP_REASON_MAPPING.get(finish_reason, 'end_turn')
 
         return anthropic_response
 
+    def _is_error_response(self, openai_response):
+        """判断上游响应是否为错误响应
+
+        先做最便宜的choices检查，再看部分API使用的status字段，最后看error字段，每个键只查一次。
+        status与server.py中的判断保持一致：为空值（None、0、""）时视为未设置，
+        200按字符串比较，兼容"200"与200两种写法；error为null时视为无错误
+        """
+        if not openai_response.get('choices'):
+            return True
+        status = openai_response.get('status')
+        if status and str(status) != '200':
+            return True
+        return openai_response.get('error') is not None
+
     def _parse_tools_from_text(self, text):
         """从文本中解析工具调用
 
@@ -379,10 +416,6 @@ class LiteConverter:
 
         return tools
 
-    def anthropic_to_openai(self, anthropic_request):
-        """Anthropic请求格式转为OpenAI格式 - 兼容性方法"""
-        return self.convert_request(anthropic_request)
-
-    def openai_to_anthropic(self, openai_response):
-        """OpenAI响应格式转为Anthropic格式 - 兼容性方法"""
-        return self.convert_response(openai_response)
+    # 兼容性方法：直接作为别名指向实现，server.py每个请求都经由这里调用，省去一层包装调用
+    anthropic_to_openai = convert_request
+    openai_to_anthropic = convert_response
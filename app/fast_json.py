@@ -0,0 +1,65 @@
+"""
+快速JSON编解码 - 优先使用orjson
+orjson为可选依赖，未安装时自动回退到标准库json
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:  # Flask < 2.2 没有JSONProvider接口
+    DefaultJSONProvider = None
+
+
+def dumps(obj):
+    """序列化为str，保留中文等非ASCII字符"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def dumps_bytes(obj):
+    """序列化为UTF-8字节串，可直接作为HTTP请求体，orjson下无需先解码再编码"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    """反序列化，支持str和bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+if orjson is not None and DefaultJSONProvider is not None:
+    class ORJSONProvider(DefaultJSONProvider):
+        """基于orjson的Flask JSON提供者，jsonify和get_json都走C实现"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+else:
+    ORJSONProvider = None
+
+
+def init_app(app):
+    """为Flask应用启用orjson，返回是否启用成功"""
+    if ORJSONProvider is None:
+        # 回退到标准库时，关闭默认的键排序和debug模式下的缩进输出
+        if DefaultJSONProvider is not None:
+            app.json.sort_keys = False
+            app.json.compact = True
+        else:
+            app.config['JSON_SORT_KEYS'] = False
+            app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        return False
+    app.json = ORJSONProvider(app)
+    return True
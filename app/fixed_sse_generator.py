@@ -9,11 +9,21 @@
 5. 确保50ms延迟配置
 """
 
-import json
+import logging
 import time
 import uuid
 from typing import Generator, Dict, Any, Optional
 from .logger_setup import get_logger
+from . import fast_json
+
+# 非SSE格式的上游限流错误特征，模块级共享，避免每行重新分配
+RATE_LIMIT_PATTERNS = (
+    '"status":"429"', '"status": "429"',
+    '"status":"449"', '"status": "449"',
+    'rate limit', 'Rate limit',
+    'exceeded.*limit', 'limit.*exceeded'
+)
+
 
 class FixedSSEGenerator:
     """修复后的SSE生成器"""
@@ -25,6 +35,8 @@ class FixedSSEGenerator:
         self.current_text_block = None
         self.current_tool_block = None
         self.logger = get_logger()  # 使用主logger确保日志输出
+        # 逐行/逐事件日志只在DEBUG级别输出，创建时判断一次，避免每个chunk格式化大字典
+        self.debug_enabled = self.logger.logger.isEnabledFor(logging.DEBUG)
 
     def _create_message_start(self, input_tokens: int = 0) -> str:
         """创建符合规范的message_start事件"""
@@ -45,7 +57,7 @@ class FixedSSEGenerator:
                 }
             }
         }
-        result = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        result = f"data: {fast_json.dumps(event)}\n\n"
         self.logger.info(f"[FIXED_SSE_DEBUG] Created message_start: {event}")
         return result
 
@@ -85,7 +97,7 @@ class FixedSSEGenerator:
             'index': block_index,
             'content_block': content_block
         }
-        result = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        result = f"data: {fast_json.dumps(event)}\n\n"
         self.logger.info(f"[FIXED_SSE_DEBUG] Created content_block_start: {event}")
         return result
 
@@ -103,8 +115,9 @@ class FixedSSEGenerator:
             'index': index,
             'delta': delta
         }
-        result = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
-        self.logger.debug(f"[FIXED_SSE_DEBUG] Created content_block_delta: index={index}, type={delta_type}, content={content[:50]}...")
+        result = f"data: {fast_json.dumps(event)}\n\n"
+        if self.debug_enabled:
+            self.logger.debug(f"[FIXED_SSE_DEBUG] Created content_block_delta: index={index}, type={delta_type}, content={content[:50]}...")
         return result
 
     def _create_content_block_stop(self, index: int) -> str:
@@ -113,7 +126,7 @@ class FixedSSEGenerator:
             'type': 'content_block_stop',
             'index': index
         }
-        result = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        result = f"data: {fast_json.dumps(event)}\n\n"
         self.logger.info(f"[FIXED_SSE_DEBUG] Created content_block_stop: index={index}")
         return result
 
@@ -129,14 +142,14 @@ class FixedSSEGenerator:
                 'output_tokens': output_tokens
             }
         }
-        result = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        result = f"data: {fast_json.dumps(event)}\n\n"
         self.logger.info(f"[FIXED_SSE_DEBUG] Created message_delta: stop_reason={stop_reason}, output_tokens={output_tokens}")
         return result
 
     def _create_message_stop(self) -> str:
         """创建message_stop事件"""
         event = {'type': 'message_stop'}
-        result = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        result = f"data: {fast_json.dumps(event)}\n\n"
         self.logger.info(f"[FIXED_SSE_DEBUG] Created message_stop")
         return result
 
@@ -164,7 +177,7 @@ class FixedSSEGenerator:
                 'status_code': status_code
             }
         }
-        return f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+        return f"data: {fast_json.dumps(error_event)}\n\n"
 
     def _create_rate_limit_error_stream(self, message: str = "Rate limit exceeded") -> Generator[str, None, None]:
         """创建完整的429错误SSE流，避免UI闪烁"""
@@ -324,38 +337,40 @@ class FixedSSEGenerator:
             tool_started = False
             tool_name = None
             tool_id = None
-            accumulated_text = ""
-            accumulated_tool_args = ""
+            # 分片收集，结束时一次性拼接，避免长流上的重复字符串拷贝
+            text_parts = []
+            tool_arg_parts = []
+
+            # 热循环内频繁调用的方法绑定为局部变量，省去每个chunk的属性查找
+            parse_json = fast_json.loads
+            create_delta = self._create_content_block_delta
+            add_delay = self._add_delay
+            debug_enabled = self.debug_enabled
 
             for raw in upstream_response.iter_lines(decode_unicode=False):
                 if not raw:
                     continue
 
-                # 解码处理
-                if isinstance(raw, bytes):
-                    line = raw.decode('utf-8', errors='replace').strip()
-                else:
-                    line = raw.strip()
+                # 上游绝大多数是data:行：直接在bytes上判断前缀并把payload交给JSON解析，
+                # 只有非SSE行才整行解码
+                if isinstance(raw, str):
+                    raw = raw.encode('utf-8')
+                line = raw.strip()
 
-                self.logger.info(f"[FIXED_SSE_DEBUG] Raw line: {line}")
+                if debug_enabled:
+                    self.logger.debug(f"[FIXED_SSE_DEBUG] Raw line: {line.decode('utf-8', errors='replace')}")
 
                 # 检查是否是直接的响应（不以data:开头）
-                if not line.startswith('data:'):
+                if not line.startswith(b'data:'):
+                    line = line.decode('utf-8', errors='replace')
                     # 检查是否是429或449错误格式（上游限流错误）
-                    rate_limit_patterns = [
-                        '"status":"429"', '"status": "429"',
-                        '"status":"449"', '"status": "449"',
-                        'rate limit', 'Rate limit',
-                        'exceeded.*limit', 'limit.*exceeded'
-                    ]
-
-                    is_rate_limit_error = any(pattern in line for pattern in rate_limit_patterns)
+                    is_rate_limit_error = any(pattern in line for pattern in RATE_LIMIT_PATTERNS)
 
                     if is_rate_limit_error:
                         self.logger.info(f"[FIXED_SSE_DEBUG] Detected rate limit error in non-SSE format: {line}")
                         # 尝试解析JSON
                         try:
-                            error_data = json.loads(line)
+                            error_data = fast_json.loads(line)
                             message = error_data.get('msg', 'Rate limit exceeded')
                             status = error_data.get('status', '429')
 
@@ -376,7 +391,7 @@ class FixedSSEGenerator:
                     elif '"choices"' in line and '"message"' in line:
                         self.logger.info(f"[FIXED_SSE_DEBUG] Detected OpenAI non-streaming response: {line[:100]}...")
                         try:
-                            response_data = json.loads(line)
+                            response_data = fast_json.loads(line)
                             # 首先检查是否是错误响应
                             if 'error' in response_data:
                                 self.logger.info(f"[FIXED_SSE_DEBUG] Detected error in OpenAI response: {response_data}")
@@ -405,16 +420,17 @@ class FixedSSEGenerator:
                         continue
 
                 payload = line[5:].strip()
-                if payload == '[DONE]':
+                if payload == b'[DONE]':
                     self.logger.info(f"[FIXED_SSE_DEBUG] Received [DONE] after {event_count} events")
                     break
 
                 # 检查是否是错误响应
                 try:
-                    evt = json.loads(payload)
-                    self.logger.info(f"[FIXED_SSE_DEBUG] Parsed JSON: {evt}")
+                    evt = parse_json(payload)
+                    if debug_enabled:
+                        self.logger.debug(f"[FIXED_SSE_DEBUG] Parsed JSON: {evt}")
                 except Exception as e:
-                    self.logger.info(f"[FIXED_SSE_DEBUG] Failed to parse JSON: {e}, payload: {payload}")
+                    self.logger.info(f"[FIXED_SSE_DEBUG] Failed to parse JSON: {e}, payload: {payload.decode('utf-8', errors='replace')}")
                     continue
 
                 # 检查是否是错误格式的响应
@@ -443,12 +459,11 @@ class FixedSSEGenerator:
                         yield self._create_error_response(int(status), message)
                         yield self._create_done()
                         return
-                else:
-                    self.logger.info(f"[FIXED_SSE_DEBUG] Not an error response, processing normally")
 
                 choices = evt.get('choices') or []
                 if not choices:
-                    self.logger.debug(f"[FIXED_SSE_DEBUG] No choices in event: {evt}")
+                    if debug_enabled:
+                        self.logger.debug(f"[FIXED_SSE_DEBUG] No choices in event: {evt}")
                     continue
 
                 choice = choices[0]
@@ -457,7 +472,6 @@ class FixedSSEGenerator:
                 if 'delta' in choice:
                     # 流式响应
                     delta = choice.get('delta') or {}
-                    self.logger.info(f"[FIXED_SSE_DEBUG] Processing streaming delta: {delta}")
                 elif 'message' in choice:
                     # 非流式响应 - 转换为流式格式
                     message = choice.get('message', {})
@@ -473,7 +487,8 @@ class FixedSSEGenerator:
                     delta = {}
 
                 event_count += 1
-                self.logger.info(f"[FIXED_SSE_DEBUG] Event {event_count}: delta={delta}")
+                if debug_enabled:
+                    self.logger.debug(f"[FIXED_SSE_DEBUG] Event {event_count}: delta={delta}")
 
                 # 处理工具调用
                 tool_calls = delta.get('tool_calls', [])
@@ -483,7 +498,7 @@ class FixedSSEGenerator:
                         if text_started and not text_finished:
                             yield self._create_content_block_stop(self.current_text_block)
                             text_finished = True
-                            self._add_delay()
+                            add_delay()
 
                         # 开始工具调用块
                         if not tool_started:
@@ -499,18 +514,18 @@ class FixedSSEGenerator:
                                     name=tool_name,
                                     input={}
                                 )
-                                self._add_delay()
+                                add_delay()
 
                         # 处理工具参数
                         args_chunk = function_delta.get('arguments', '')
                         if args_chunk:
-                            accumulated_tool_args += args_chunk
-                            yield self._create_content_block_delta(
+                            tool_arg_parts.append(args_chunk)
+                            yield create_delta(
                                 self.current_tool_block,
                                 'input_json_delta',
                                 args_chunk
                             )
-                            self._add_delay()
+                            add_delay()
 
                 # 处理普通文本内容
                 elif delta.get('function_call'):
@@ -521,7 +536,7 @@ class FixedSSEGenerator:
                         if text_started and not text_finished:
                             yield self._create_content_block_stop(self.current_text_block)
                             text_finished = True
-                            self._add_delay()
+                            add_delay()
 
                         if not tool_started:
                             tool_started = True
@@ -534,17 +549,17 @@ class FixedSSEGenerator:
                                 name=tool_name,
                                 input={}
                             )
-                            self._add_delay()
+                            add_delay()
 
                         args_chunk = fc.get('arguments') or ''
                         if args_chunk:
-                            accumulated_tool_args += args_chunk
-                            yield self._create_content_block_delta(
+                            tool_arg_parts.append(args_chunk)
+                            yield create_delta(
                                 self.current_tool_block,
                                 'input_json_delta',
                                 args_chunk
                             )
-                            self._add_delay()
+                            add_delay()
 
                 else:
                     # 普通文本内容 - 支持reasoning_content和content
@@ -553,15 +568,15 @@ class FixedSSEGenerator:
                         if not text_started:
                             text_started = True
                             yield self._create_content_block_start('text')
-                            self._add_delay()
+                            add_delay()
 
-                        accumulated_text += text_delta
-                        yield self._create_content_block_delta(
+                        text_parts.append(text_delta)
+                        yield create_delta(
                             self.current_text_block,
                             'text_delta',
                             text_delta
                         )
-                        self._add_delay()
+                        add_delay()
 
             # 3. 确保所有块都正确结束
             if text_started and not text_finished:
@@ -574,6 +589,8 @@ class FixedSSEGenerator:
 
             # 4. 发送结束事件
             stop_reason = 'tool_use' if tool_started else 'end_turn'
+            accumulated_text = ''.join(text_parts)
+            accumulated_tool_args = ''.join(tool_arg_parts)
             output_tokens = len(accumulated_text.split()) + len(accumulated_tool_args.split()) // 4  # 简单估算
 
             yield self._create_message_delta(stop_reason, max(1, output_tokens))
@@ -594,7 +611,7 @@ class FixedSSEGenerator:
                     'message': str(e)
                 }
             }
-            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+            yield f"data: {fast_json.dumps(error_event)}\n\n"
             yield self._create_done()
 
 
@@ -186,7 +186,10 @@ class SafeLogger:
                 "{}HTTP Request - Method: {}, Path: {}, Client: {}".format(prefix, method, path, client_ip)
             )
 
-            # 详细信息在DEBUG级别记录
+            # 详细信息只在DEBUG级别记录，未启用时跳过整个请求体的序列化
+            if not self.logger.isEnabledFor(logging.DEBUG):
+                return
+
             if headers:
                 safe_headers = {k: v for k, v in headers.items()
                               if k.lower() not in ['authorization', 'cookie', 'x-api-key']}
@@ -9,8 +9,15 @@ import json
 import threading
 from datetime import datetime
 from collections import defaultdict, deque
+from itertools import islice
 from .logger_setup import get_logger
 
+def _tail(items, n):
+    """取deque末尾n项：反向迭代只访问n个元素，不复制整个队列"""
+    tail = list(islice(reversed(items), n))
+    tail.reverse()
+    return tail
+
 class ErrorMonitor:
     """错误监控器，收集和分析错误信息"""
 
@@ -58,14 +65,26 @@ class ErrorMonitor:
             if not self.performance_metrics:
                 return {"status": "no_data"}
 
-            recent_metrics = list(self.performance_metrics)[-50:]  # 最近50个请求
+            recent_metrics = _tail(self.performance_metrics, 50)  # 最近50个请求
             total_requests = len(recent_metrics)
-            successful_requests = sum(1 for m in recent_metrics if m['success'])
+
+            # 一次遍历同时统计成功数、总耗时和最大/最小耗时
+            successful_requests = 0
+            total_duration = 0.0
+            max_duration = float('-inf')
+            min_duration = float('inf')
+            for m in recent_metrics:
+                duration = m['duration']
+                total_duration += duration
+                if duration > max_duration:
+                    max_duration = duration
+                if duration < min_duration:
+                    min_duration = duration
+                if m['success']:
+                    successful_requests += 1
 
             if total_requests > 0:
-                avg_duration = sum(m['duration'] for m in recent_metrics) / total_requests
-                max_duration = max(m['duration'] for m in recent_metrics)
-                min_duration = min(m['duration'] for m in recent_metrics)
+                avg_duration = total_duration / total_requests
             else:
                 avg_duration = max_duration = min_duration = 0
 
@@ -81,7 +100,7 @@ class ErrorMonitor:
                     'min_duration': min_duration
                 },
                 'error_counts': dict(self.error_counts),
-                'recent_errors': list(self.error_history)[-10:]  # 最近10个错误
+                'recent_errors': _tail(self.error_history, 10)  # 最近10个错误
             }
 
 class EnhancedErrorHandler:
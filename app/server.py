@@ -4,17 +4,19 @@
 包含SSE流式传输优化，解决Claude Code界面闪烁问题
 """
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
+import http.cookiejar
 import requests
+from requests.adapters import HTTPAdapter
 import time
-import uuid
-import json
+import itertools
 from .converter import LiteConverter
 from .config import LiteConfig
 from .logger_setup import get_logger
 from .simple_sse_optimizer import get_simple_sse_optimizer
 from .fixed_sse_generator import create_fixed_sse_generator
+from . import fast_json
 
 # 初始化配置
 config = LiteConfig()
@@ -22,14 +24,61 @@ logger = get_logger('api_server', config.config.get('logging', {}))
 sse_optimizer = get_simple_sse_optimizer()
 
 app = Flask(__name__)
+fast_json.init_app(app)  # 安装了orjson时jsonify/get_json使用C实现
 converter = LiteConverter(model_mappings=config.config.get('model_mappings', []))
 
+# 上游调用复用同一会话，请求头在启动时固定，避免每个请求重新构建
+# 上游地址和认证头由LiteConfig缓存，配置更新时刷新
+upstream_session = requests.Session()
+upstream_session.headers.update({
+    'Content-Type': 'application/json',
+    'Authorization': config.auth_header,
+    'Connection': 'keep-alive'
+})
+# 会话由所有客户端共享，拒绝保存上游的Set-Cookie，避免一个请求拿到的cookie被重放给其他请求
+upstream_session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+# 上游只有一个主机，连接池上限按并发线程数放宽（默认只有10个连接），代理层不做自动重试
+_upstream_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=64, max_retries=0)
+upstream_session.mount('https://', _upstream_adapter)
+upstream_session.mount('http://', _upstream_adapter)
+
+# 连接超时单独设置：DNS/建连异常时快速失败，读超时仍给流式响应留足时间
+UPSTREAM_CONNECT_TIMEOUT = 3.05
+
+# SSE响应头为固定值，模块级共享，Response构造时会复制到自己的Headers中
+# X-Accel-Buffering: no 关闭nginx等反向代理的缓冲，保证事件逐条到达客户端
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no'
+}
+RATE_LIMIT_SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, Anthropic-Version',
+    # 符合Anthropic规范的retry-after头
+    'retry-after': '60',
+    'anthropic-ratelimit-requests-limit': '60',
+    'anthropic-ratelimit-requests-remaining': '0'
+}
+
+# /v1/models 响应缓存（秒），配置更新时清空
+MODELS_CACHE_TTL = 60
+_models_cache = {'ts': 0.0, 'body': None}
+
+# 请求ID：进程前缀 + 递增计数，避免每个请求调用uuid4读取系统随机数
+_REQUEST_ID_PREFIX = os.urandom(3).hex()
+_REQUEST_ID_COUNTER = itertools.count(1)
+
 @app.before_request
 def log_request_info():
     """记录请求信息"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     request.start_time = start_time
-    request_id = f"req_{uuid.uuid4().hex[:12]}"
+    request_id = f"req_{_REQUEST_ID_PREFIX}{next(_REQUEST_ID_COUNTER):06x}"
     request.request_id = request_id
 
     try:
@@ -54,7 +103,7 @@ def log_request_info():
 def log_response_info(response):
     """记录响应信息并拦截449错误"""
     if hasattr(request, 'start_time') and hasattr(request, 'request_id'):
-        end_time = time.time()
+        end_time = time.perf_counter()
         duration = (end_time - request.start_time) * 1000
 
         # 终极449拦截 - 确保没有任何449能泄漏出去
@@ -85,7 +134,8 @@ def log_response_info(response):
             logger.log_response(
                 status_code=response.status_code,
                 duration_ms=duration,
-                response_size=len(response.get_data()) if hasattr(response, 'get_data') else 0,
+                # 流式响应不能调用get_data，否则会把整个生成器读完缓冲后才发送
+                response_size=None if response.is_streamed else response.content_length,
                 request_id=request.request_id
             )
         except Exception as e:
@@ -158,24 +208,17 @@ def messages():
         # 转换为OpenAI格式
         openai_request = converter.anthropic_to_openai(anthropic_request)
 
-        # API调用配置
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {config.get_openai_config()["api_key"]}'
-        }
-
         # 检查是否需要流式响应
         client_wants_stream = anthropic_request.get('stream') is True
 
         if client_wants_stream:
             # 流式请求处理
             try:
-                response = requests.post(
-                    f'{config.get_openai_config()["base_url"]}/chat/completions',
-                    headers=headers,
-                    json=openai_request,
+                response = upstream_session.post(
+                    config.chat_completions_url,
+                    data=fast_json.dumps_bytes(openai_request),
                     stream=True,
-                    timeout=60
+                    timeout=(UPSTREAM_CONNECT_TIMEOUT, 60)
                 )
 
                 logger.debug(f"[SERVER_DEBUG] Upstream response status code: {response.status_code}")
@@ -189,7 +232,7 @@ def messages():
                         # 尝试解析上游错误消息
                         error_message = 'Your account has hit a rate limit.'
                         try:
-                            error_data = response.json()
+                            error_data = fast_json.loads(response.content)
                             if isinstance(error_data, dict):
                                 error_message = error_data.get('msg') or error_data.get('message', error_message)
                         except:
@@ -218,16 +261,7 @@ def messages():
                         sse_response = Response(
                             stream_with_context(generate_rate_limit_sse()),
                             mimetype='text/event-stream',
-                            headers={
-                                'Cache-Control': 'no-cache',
-                                'Connection': 'keep-alive',
-                                'Access-Control-Allow-Origin': '*',
-                                'Access-Control-Allow-Headers': 'Content-Type, Authorization, Anthropic-Version',
-                                # 添加符合Anthropic规范的retry-after头
-                                'retry-after': '60',
-                                'anthropic-ratelimit-requests-limit': '60',
-                                'anthropic-ratelimit-requests-remaining': '0'
-                            }
+                            headers=RATE_LIMIT_SSE_HEADERS
                         )
                         return sse_response, converted_status  # 返回转换后的429状态码，而不是200
                     else:
@@ -248,7 +282,7 @@ def messages():
                     # 尝试解析上游错误消息
                     error_message = 'Your account has hit a rate limit.'
                     try:
-                        error_data = response.json()
+                        error_data = fast_json.loads(response.content)
                         if isinstance(error_data, dict):
                             error_message = error_data.get('msg') or error_data.get('message', error_message)
                     except:
@@ -277,16 +311,7 @@ def messages():
                     sse_response = Response(
                         stream_with_context(generate_rate_limit_sse()),
                         mimetype='text/event-stream',
-                        headers={
-                            'Cache-Control': 'no-cache',
-                            'Connection': 'keep-alive',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Headers': 'Content-Type, Authorization, Anthropic-Version',
-                            # 添加符合Anthropic规范的retry-after头
-                            'retry-after': '60',
-                            'anthropic-ratelimit-requests-limit': '60',
-                            'anthropic-ratelimit-requests-remaining': '0'
-                        }
+                        headers=RATE_LIMIT_SSE_HEADERS
                     )
                     return sse_response, converted_status  # 返回转换后的429状态码
 
@@ -315,11 +340,7 @@ def messages():
 
                 return Response(
                     create_optimized_sse_generator(response, request.headers, model_name, input_tokens),
-                    headers={
-                        'Content-Type': 'text/event-stream',
-                        'Cache-Control': 'no-cache',
-                        'Connection': 'keep-alive'
-                    },
+                    headers=SSE_HEADERS,
                     mimetype='text/event-stream'
                 ), response_status
 
@@ -336,15 +357,14 @@ def messages():
         else:
             # 非流式请求处理
             try:
-                response = requests.post(
-                    f'{config.get_openai_config()["base_url"]}/chat/completions',
-                    headers=headers,
-                    json=openai_request,
-                    timeout=60
+                response = upstream_session.post(
+                    config.chat_completions_url,
+                    data=fast_json.dumps_bytes(openai_request),
+                    timeout=(UPSTREAM_CONNECT_TIMEOUT, 60)
                 )
 
                 try:
-                    openai_response = response.json()
+                    openai_response = fast_json.loads(response.content)
                 except:
                     openai_response = {'error': {'message': response.text}}
 
@@ -374,7 +394,7 @@ def messages():
                         # 尝试解析上游错误消息
                         error_message = 'Your account has hit a rate limit.'
                         try:
-                            error_data = response.json()
+                            error_data = fast_json.loads(response.content)
                             if isinstance(error_data, dict):
                                 error_message = error_data.get('msg') or error_data.get('message', error_message)
                         except:
@@ -460,23 +480,27 @@ def messages():
 @app.route('/v1/models', methods=['GET'])
 def list_models():
     """模型列表"""
+    # 模型列表很少变化，缓存期内直接返回上游原始字节，不再请求上游
+    now = time.monotonic()
+    cached_body = _models_cache['body']
+    if cached_body is not None and now - _models_cache['ts'] < MODELS_CACHE_TTL:
+        return Response(cached_body, mimetype='application/json')
+
     try:
-        headers = {
-            'Authorization': f'Bearer {config.get_openai_config()["api_key"]}'
-        }
-
-        response = requests.get(
-            f'{config.get_openai_config()["base_url"]}/models',
-            headers=headers,
-            timeout=30
+        response = upstream_session.get(
+            config.models_url,
+            timeout=(UPSTREAM_CONNECT_TIMEOUT, 30)
         )
 
         if response.status_code == 200:
-            return jsonify(response.json())
+            fast_json.loads(response.content)  # 确认是合法JSON后再缓存
+            _models_cache['body'] = response.content
+            _models_cache['ts'] = now
+            return Response(response.content, mimetype='application/json')
         else:
             return jsonify({
                 'error': {
-                    'message': f'OpenAI API error: {response.text}',
+                    'message': f'OpenAI API error: {response.text[:512]}',
                     'type': 'api_error'
                 }
             }), response.status_code
@@ -532,6 +556,8 @@ def config_endpoint():
             new_config = request.get_json()
             if new_config:
                 config.update_config(new_config)
+                upstream_session.headers['Authorization'] = config.auth_header
+                _models_cache['body'] = None
                 return jsonify({'status': 'success', 'message': 'Configuration updated'}), 200
             else:
                 return jsonify({'error': 'No configuration provided'}), 400
@@ -9,6 +9,13 @@ from .logger_setup import get_logger
 class SimpleSSEOptimizer:
     """简化的SSE优化器"""
 
+    CLAUDE_INDICATORS = (
+        'claude-cli',
+        'claude-code',
+        'claude-code-router',
+        'anthropic-claude-code'
+    )
+
     def __init__(self):
         self.logger = get_logger('api_server')
         self.enabled = True  # 启用SSE优化器修复UI闪烁问题
@@ -25,14 +32,8 @@ class SimpleSSEOptimizer:
         user_agent = user_agent or (request_headers.get('User-Agent', '') if request_headers else '')
 
         # 更精确的Claude Code检测
-        claude_indicators = [
-            'claude-cli',
-            'claude-code',
-            'claude-code-router',
-            'anthropic-claude-code'
-        ]
-
-        should_opt = any(indicator in user_agent.lower() for indicator in claude_indicators)
+        user_agent_lower = user_agent.lower()
+        should_opt = any(indicator in user_agent_lower for indicator in self.CLAUDE_INDICATORS)
         self.logger.debug(f"SSE optimization check - User-Agent: {user_agent}, Should optimize: {should_opt}")
 
         return should_opt
@@ -45,11 +46,10 @@ class SimpleSSEOptimizer:
         def optimized_generator():
             self.logger.debug("Starting simple SSE optimization")
             count = 0
-            start_time = time.time()
+            start_time = time.perf_counter()
 
             for data in original_generator:
                 count += 1
-                current_time = time.time()
 
                 # 发送数据
                 yield data
@@ -60,7 +60,7 @@ class SimpleSSEOptimizer:
                     time.sleep(sleep_time)
                     self.logger.debug(f"Event {count}: added {self.interval_ms}ms delay")
 
-            total_time = time.time() - start_time
+            total_time = time.perf_counter() - start_time
             self.logger.debug(f"Simple SSE optimization completed: {count} events in {total_time:.2f}s")
 
         return optimized_generator()
@@ -15,6 +15,26 @@ from .logger_setup import get_logger
 class SSEOptimizer:
     """SSE流式传输优化器"""
 
+    # 检测用的关键字在类加载时统一转为小写，避免每次调用重复构建和转换
+    CLAUDE_INDICATORS = (
+        'claude-code',
+        'claude-code-router',
+        'anthropic-claude-code',
+        'claude-cli'  # 真实的Claude Code CLI客户端标识
+    )
+
+    TOOL_INDICATORS = tuple(indicator.lower() for indicator in (
+        'tool_use',
+        'tool_result',
+        'tool_call',
+        '"type": "tool_use"',
+        '"type": "tool_result"',
+        'function_call',
+        'arguments',
+        'Task tool',
+        'agent tool'
+    ))
+
     def __init__(self):
         # 使用与主服务器相同的logger配置，确保DEBUG日志能正确输出
         self.logger = get_logger('api_server')  # 改为使用api_server的logger
@@ -30,14 +50,8 @@ class SSEOptimizer:
         # 检测Claude Code客户端
         user_agent = user_agent or (request_headers.get('User-Agent', '') if request_headers else '')
 
-        claude_indicators = [
-            'claude-code',
-            'claude-code-router',
-            'anthropic-claude-code',
-            'claude-cli'  # 添加真实的Claude Code CLI客户端标识
-        ]
-
-        should_opt = any(indicator.lower() in user_agent.lower() for indicator in claude_indicators)
+        user_agent_lower = user_agent.lower()
+        should_opt = any(indicator in user_agent_lower for indicator in self.CLAUDE_INDICATORS)
         self.logger.debug(f"SSE optimization check - User-Agent: {user_agent}, Should optimize: {should_opt}")
         return should_opt
 
@@ -51,7 +65,7 @@ class SSEOptimizer:
             event_buffer = []
             last_emit_time = 0
             total_events = 0
-            buffer_start_time = time.time()
+            buffer_start_time = time.monotonic()
 
             # 智能检测变量
             tool_call_detected = False
@@ -70,7 +84,7 @@ class SSEOptimizer:
             self.logger.debug("Starting超级智能SSE generator - 工具调用优化模式")
 
             for data in original_generator:
-                current_time = time.time()
+                current_time = time.monotonic()
                 total_events += 1
 
                 # 检测是否为工具调用相关事件
@@ -108,7 +122,7 @@ class SSEOptimizer:
                 if should_emit and event_buffer:
                     self._flush_buffer_smoothly(event_buffer, current_interval)
                     event_buffer.clear()
-                    buffer_start_time = time.time()
+                    buffer_start_time = time.monotonic()
 
             # 最终刷新
             if event_buffer:
@@ -123,21 +137,8 @@ class SSEOptimizer:
         if not data or not isinstance(data, str):
             return False
 
-        # 检测工具调用特征
-        tool_indicators = [
-            'tool_use',
-            'tool_result',
-            'tool_call',
-            '"type": "tool_use"',
-            '"type": "tool_result"',
-            'function_call',
-            'arguments',
-            'Task tool',
-            'agent tool'
-        ]
-
         data_lower = data.lower()
-        return any(indicator.lower() in data_lower for indicator in tool_indicators)
+        return any(indicator in data_lower for indicator in self.TOOL_INDICATORS)
 
     def _flush_buffer_smoothly(self, buffer, interval):
         """平滑刷新缓冲区"""
@@ -146,9 +147,9 @@ class SSEOptimizer:
 
         self.logger.debug(f"平滑刷新缓冲区: {len(buffer)} 个事件, 间隔 {interval}ms")
 
-        last_emit_time = time.time()
+        last_emit_time = time.monotonic()
         for i, data in enumerate(buffer):
-            current_time = time.time()
+            current_time = time.monotonic()
             if i == 0:
                 # 第一个立即发送
                 yield data
@@ -159,21 +160,14 @@ class SSEOptimizer:
                 if elapsed < interval:
                     time.sleep(max(0, (interval - elapsed) / 1000.0))
                 yield data
-                last_emit_time = time.time()
+                last_emit_time = time.monotonic()
 
     def smooth_sse_stream(self, upstream_data):
         """平滑SSE流式传输"""
         if not self.enable_optimization:
             return upstream_data
 
-        smoothed_data = []
-        current_time = time.time()
-
-        for data in upstream_data:
-            smoothed_data.append(data)
-            current_time = time.time()
-
-        return smoothed_data
+        return list(upstream_data)
 
 # 全局优化器实例
 _global_optimizer = SSEOptimizer()
@@ -0,0 +1,34 @@
+"""
+Gunicorn 生产部署配置
+用法: gunicorn -c gunicorn.conf.py app.server:app
+gthread 线程池，避免开发服务器限制并发（仅支持 Linux/macOS）
+
+默认只启动1个worker，靠线程扩展并发：应用的运行时状态都在进程内存中，
+多worker时各自独立、互不同步：
+- POST /config 只修改处理该请求的worker的内存配置（不写盘），上游认证头和
+  /v1/models 缓存也只在该worker刷新；多worker下修改配置需改config.json或环境变量后重启
+- 错误监控统计、/v1/models 缓存均按worker分别计算
+- 不会加载 .env.development（只有 svc.py 会加载），需在启动前导出环境变量
+"""
+
+import gc
+import os
+from app.config import LiteConfig
+
+_server_cfg = LiteConfig().get_server_config()
+
+bind = f"{_server_cfg['host']}:{_server_cfg['port']}"
+# 调大前请确认可以接受上面列出的多worker限制
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+# 默认gthread；设置 GUNICORN_WORKER_CLASS=gevent 改用协程（需 pip install gevent，gunicorn会自动monkey patch）
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))  # 仅gthread生效
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))  # 仅gevent生效
+keepalive = 75
+reuse_port = True  # SO_REUSEPORT，由内核在worker之间分配连接
+timeout = 120  # 上游流式响应可能持续较久
+
+
+def post_worker_init(worker):
+    """worker加载完应用后冻结现有对象，后续GC只扫描请求期间新建的对象"""
+    gc.freeze()
@@ -6,13 +6,33 @@
 
 import sys
 import os
+import re
 import unittest
 import subprocess
+from importlib.metadata import version, PackageNotFoundError
 from pathlib import Path
 
 # 添加当前目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent))
 
+def check_dependencies(req_file):
+    """检查依赖是否已安装，返回缺失的依赖行
+
+    按发行包名查询已安装的元数据，而不是按模块名查找：PyYAML(yaml)、
+    python-dotenv(dotenv)等包名与导入名不同，也不会执行任何模块代码
+    """
+    missing = []
+    for line in req_file.read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        package = re.split(r'[<>=!~\[;\s]', line, maxsplit=1)[0]
+        try:
+            version(package)
+        except PackageNotFoundError:
+            missing.append(line)
+    return missing
+
 def run_tests():
     """运行所有测试"""
     # 设置测试环境
@@ -35,15 +55,19 @@ if __name__ == '__main__':
     print("运行API服务器集成测试...")
     print("=" * 50)
 
-    # 测试前安装依赖
+    # 测试前安装缺失的依赖
     req_file = Path(__file__).parent / 'requirements.txt'
     if req_file.exists():
-        print("安装测试依赖...")
-        try:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-r', str(req_file)])
-            print("依赖安装完成")
-        except subprocess.CalledProcessError as e:
-            print(f"依赖安装失败: {e}")
+        missing = check_dependencies(req_file)
+        if missing:
+            print(f"安装缺失依赖: {', '.join(missing)}")
+            try:
+                subprocess.check_call([sys.executable, '-m', 'pip', 'install', *missing])
+                print("依赖安装完成")
+            except subprocess.CalledProcessError as e:
+                print(f"依赖安装失败: {e}")
+        else:
+            print("依赖已满足，跳过安装")
     else:
         print("未找到 requirements.txt，跳过依赖安装")
 
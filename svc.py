@@ -3,36 +3,70 @@
 服务管理器：负责API服务启停管理
 """
 
+import atexit
+import errno
+import functools
+import gc
 import os
 import sys
 import time
 import subprocess
-import psutil
 import socket
+import select
 import re
 from pathlib import Path
-from app.server import app, config, logger
+from app.config import LiteConfig
 import logging
-import requests
+
+_logger = logging.getLogger(__name__)
+
+# Flask应用、psutil只在真正需要时导入，status/stop等命令无需加载整个服务
+
+# 服务进程启动时写入自身PID，查找进程时优先读取，避免扫描netstat
+PID_FILE = Path(__file__).resolve().with_name('server.pid')
+
+# 后台服务的stdout/stderr以追加方式写入该文件（与PID文件一样按脚本位置定位，与当前目录无关），
+# 进程完全脱离终端后，启动失败的异常信息仍可查看
+CONSOLE_LOG_FILE = Path(__file__).resolve().parent / 'logs' / 'server_console.log'
+# 启动失败时最多输出控制台日志末尾的字节数
+CONSOLE_TAIL_BYTES = 4096
+
+# .env文件中的 KEY=VALUE 行，#开头的注释行不匹配；只用[ \t]而非\s，避免空值时跨行吞掉下一行
+_ENV_LINE_RE = re.compile(r'^[ \t]*([A-Za-z_][A-Za-z0-9_.]*)[ \t]*=[ \t]*(.*?)[ \t]*$', re.M)
+
+
+@functools.lru_cache(maxsize=8)
+def _netstat_pattern(port):
+    """获取指定端口的netstat LISTENING行匹配模式，四种监听地址合并为一个分支，按端口编译一次"""
+    return re.compile(
+        rf'TCP\s+(?:0\.0\.0\.0:{port}\s+0\.0\.0\.0:0'
+        rf'|127\.0\.0\.1:{port}\s+0\.0\.0\.0:0'
+        rf'|\*:{port}\s+0\.0\.0\.0:0'
+        rf'|\[::\]:{port}\s+\[::\]:0)\s+LISTENING\s+(\d+)'
+    )
+
 
 class ServiceManager:
     """服务启停管理类"""
 
     def __init__(self):
         self._server_port = None
+        # 上次找到的服务进程，is_running()仍为真且端口相同时直接复用，避免重复查找
+        self._server_proc = None
+        # 服务器配置在管理器生命周期内不变，start/stop/status/restart共用同一份；
+        # 须在load_env_file之后创建，确保与run_server子进程读到的是同一份配置
+        self._server_cfg = LiteConfig().get_server_config()
 
-    def load_env_file(self, env_file: str = '.env.development'):
-        """加载环境变量文件"""
+    @staticmethod
+    def load_env_file(env_file: str = '.env.development', quiet: bool = False):
+        """加载环境变量文件；quiet为True时结果只记DEBUG日志，不输出到终端"""
+        report = _logger.debug if quiet else print
         p = Path(env_file)
         if p.exists():
-            for line in p.read_text(encoding='utf-8').splitlines():
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip()
-            print(f"已加载环境配置: {env_file}")
+            os.environ.update(_ENV_LINE_RE.findall(p.read_text(encoding='utf-8')))
+            report(f"已加载环境配置: {env_file}")
         else:
-            print(f"环境配置文件不存在: {env_file}")
+            report(f"环境配置文件不存在: {env_file}")
 
     def is_port_in_use(self, port, retries=3, delay=0.5):
         """使用socket连接检查端口是否被占用"""
@@ -51,43 +85,138 @@ class ServiceManager:
         
         return False
 
+    def is_port_open_now(self, port, timeout=0.05):
+        """非阻塞探测端口当前是否可连接，不重试不睡眠，最多等待timeout秒"""
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.setblocking(False)
+                result = s.connect_ex(('127.0.0.1', port))
+                if result == 0:
+                    return True
+                if result not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                    return False
+                _, writable, _ = select.select([], [s], [], timeout)
+                return bool(writable) and s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+        except OSError:
+            return False
+
+    def write_pid_file(self):
+        """记录当前服务进程PID，进程正常退出时删除"""
+        try:
+            PID_FILE.write_text(str(os.getpid()), encoding='utf-8')
+            atexit.register(self.remove_pid_file)
+        except OSError:
+            pass
+
+    def remove_pid_file(self):
+        """删除PID文件"""
+        try:
+            PID_FILE.unlink()
+        except OSError:
+            pass
+
+    def _pid_from_file(self):
+        """读取PID文件，不存在或内容无效时返回None"""
+        try:
+            return int(PID_FILE.read_text(encoding='utf-8').strip())
+        except (OSError, ValueError):
+            return None
+
+    def _as_server_process(self, pid):
+        """确认PID对应的是本服务的Python进程"""
+        import psutil
+        try:
+            proc = psutil.Process(pid)
+            cmdline = ' '.join(proc.cmdline() or []).lower()
+            if 'python' in proc.name().lower() and ('server' in cmdline or 'app.server' in cmdline):
+                return proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        return None
+
+    def _listens_on(self, proc, port):
+        """确认进程自身持有该端口上的监听socket"""
+        import psutil
+        try:
+            # psutil 6.0起改名为net_connections，旧版本只有connections
+            get_connections = getattr(proc, 'net_connections', None) or proc.connections
+            return any(
+                conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port
+                for conn in get_connections(kind='inet')
+            )
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
     def find_server_process(self, port):
         """查找占用指定端口的服务器进程"""
-        if not self.is_port_in_use(port):
+        if not self.is_port_open_now(port):
             return None
-        
+
+        cached = self._server_proc
+        if cached is not None and port == self._server_port and cached.is_running():
+            return cached
+
+        proc = self._lookup_server_process(port)
+        if proc:
+            self._server_proc = proc
+            self._server_port = port
+        return proc
+
+    def _lookup_server_process(self, port):
+        """依次通过PID文件、系统连接表、netstat查找服务进程"""
+        # 快速路径：PID文件中的进程仍然存活、是本服务且正在监听该端口时直接返回；
+        # 否则PID文件已过期（进程已退出或PID被其他进程复用），删除后走完整查找
+        pid = self._pid_from_file()
+        if pid is not None:
+            proc = self._as_server_process(pid)
+            if proc and self._listens_on(proc, port):
+                return proc
+            self.remove_pid_file()
+
+        # 优先直接查询系统连接表，无需启动netstat子进程再解析文本；
+        # 无权限读取连接表或看不到PID时才回退到netstat
+        import psutil
         try:
-            result = subprocess.run(['netstat', '-ano'], capture_output=True, text=True)
-            if result.returncode == 0:
-                patterns = [
-                    rf'TCP\s+0.0.0.0:{port}\s+0.0.0.0:0\s+LISTENING\s+(\d+)',
-                    rf'TCP\s+127.0.0.1:{port}\s+0.0.0.0:0\s+LISTENING\s+(\d+)',
-                    rf'TCP\s+\*:{port}\s+0.0.0.0:0\s+LISTENING\s+(\d+)',
-                    rf'TCP\s+\[::\]:{port}\s+\[::\]:0\s+LISTENING\s+(\d+)'
-                ]
-                
-                for pattern in patterns:
-                    matches = re.findall(pattern, result.stdout)
-                    if matches:
-                        pid = int(matches[0])
-                        try:
-                            proc = psutil.Process(pid)
-                            cmdline = ' '.join(proc.cmdline() or []).lower()
-                            if 'python' in proc.name().lower() and ('server' in cmdline or 'app.server' in cmdline):
+            pid_hidden = False
+            for conn in psutil.net_connections(kind='inet'):
+                if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port:
+                    if conn.pid is None:
+                        pid_hidden = True
+                        continue
+                    proc = self._as_server_process(conn.pid)
+                    if proc:
+                        return proc
+            if not pid_hidden:
+                return None
+        except psutil.AccessDenied:
+            pass
+
+        try:
+            pattern = _netstat_pattern(port)
+
+            # 逐行读取netstat输出，找到目标进程后立即结束，不缓存完整输出
+            with subprocess.Popen(['netstat', '-ano'], stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, text=True) as netstat:
+                try:
+                    for line in netstat.stdout:
+                        match = pattern.search(line)
+                        if match:
+                            proc = self._as_server_process(int(match.group(1)))
+                            if proc:
                                 return proc
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
+                finally:
+                    netstat.kill()
         except Exception:
             pass
         return None
 
     def start(self, background: bool = False):
         """启动服务"""
-        server_cfg = config.get_server_config()
+        server_cfg = self._server_cfg
         port = server_cfg['port']
         self._server_port = port
         
-        if self.is_port_in_use(port):
+        if self.is_port_open_now(port):
             existing_proc = self.find_server_process(port)
             if existing_proc:
                 print(f"服务已在端口 {port} 运行")
@@ -97,59 +226,62 @@ class ServiceManager:
                 return
 
         try:
-            self.load_env_file()
             os.environ.setdefault('PYTHONIOENCODING', 'utf-8')
 
             print("启动API服务器...")
             print(f"地址: http://{server_cfg['host']}:{server_cfg['port']}/")
 
             if background:
-                # 后台模式启动
-                creation_flags = 0
-                if sys.platform == "win32":
-                    creation_flags = subprocess.CREATE_NO_WINDOW
+                # 后台模式启动：stdout/stderr追加写入控制台日志文件并脱离当前会话/控制台，
+                # 启动它的终端退出后服务既不会收到SIGHUP，也不会因管道断开写stderr失败
                 cmd = [sys.executable, __file__, 'run_server']
-                
+                popen_kwargs = dict(
+                    stdin=subprocess.DEVNULL,
+                    stderr=subprocess.STDOUT,
+                )
+                if sys.platform == "win32":
+                    # DETACHED_PROCESS不分配控制台，本身就不会弹出窗口
+                    popen_kwargs['creationflags'] = (subprocess.DETACHED_PROCESS
+                                                     | subprocess.CREATE_NEW_PROCESS_GROUP)
+                else:
+                    popen_kwargs['start_new_session'] = True
+
                 try:
-                    # 直接启动子进程，不创建临时日志文件
-                    # 所有日志都会通过主日志系统记录
-                    process = subprocess.Popen(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        creationflags=creation_flags
-                    )
-                    
-                    # 等待服务启动 - 优化等待逻辑
-                    for i in range(20):  # 最多等待20次，每次0.3秒 = 6秒
-                        time.sleep(0.3)
-                        if self.is_port_in_use(port):
+                    CONSOLE_LOG_FILE.parent.mkdir(exist_ok=True)
+                    # 追加模式打开后文件位置即在末尾，记下偏移量，启动失败时只输出本次启动的内容；
+                    # 子进程继承文件描述符后父进程即可关闭自己的副本
+                    with open(CONSOLE_LOG_FILE, 'ab', buffering=0) as console_log:
+                        console_offset = console_log.tell()
+                        process = subprocess.Popen(cmd, stdout=console_log, **popen_kwargs)
+
+                    # 等待服务启动：单次端口探测 + 指数退避，端口一旦可连接立即返回，最多等待6秒
+                    deadline = time.monotonic() + 6
+                    delay = 0.05
+                    while time.monotonic() < deadline:
+                        if self.is_port_open_now(port):
                             print(f"服务已启动 (PID: {process.pid})")
                             return
-                        
+
                         # 检查进程是否还在运行
                         if process.poll() is not None:
-                            # 进程已退出，读取错误信息
-                            try:
-                                stdout, stderr = process.communicate(timeout=1)
-                                error_msg = stderr.decode('utf-8', errors='replace') if stderr else ""
-                                if error_msg:
-                                    print(f"服务启动失败: {error_msg}")
-                                else:
-                                    print("服务启动失败: 进程意外退出")
-                            except:
-                                print("服务启动失败: 进程意外退出")
+                            error_msg = self._read_console_log(console_offset)
+                            if error_msg:
+                                print(f"服务启动失败:\n{error_msg}")
+                            else:
+                                print(f"服务启动失败: 进程意外退出 (退出码 {process.returncode})")
                             return
-                    
+
+                        # 用wait代替sleep：子进程提前退出时立即返回，不必等满退避间隔
+                        try:
+                            process.wait(timeout=max(0, min(delay, deadline - time.monotonic())))
+                        except subprocess.TimeoutExpired:
+                            pass
+                        delay = min(delay * 2, 0.5)
+
                     print("服务启动超时")
-                    # 尝试获取错误信息
-                    try:
-                        stdout, stderr = process.communicate(timeout=1)
-                        error_msg = stderr.decode('utf-8', errors='replace') if stderr else ""
-                        if error_msg:
-                            print(f"启动错误信息: {error_msg}")
-                    except:
-                        pass
+                    error_msg = self._read_console_log(console_offset)
+                    if error_msg:
+                        print(f"启动错误信息:\n{error_msg}")
                     return
                     
                 except Exception as e:
@@ -157,48 +289,68 @@ class ServiceManager:
                     return
             else:
                 # 前台模式启动
+                from app.server import app
+                self.write_pid_file()
+                gc.freeze()  # 启动期创建的长生命周期对象移出GC跟踪，减少后续回收扫描
                 app.run(host=server_cfg['host'], port=server_cfg['port'], debug=server_cfg['debug'])
 
         except Exception as e:
             print(f"启动服务时出错: {e}")
             return
 
+    def _read_console_log(self, offset):
+        """读取控制台日志中offset之后写入的内容，只保留末尾CONSOLE_TAIL_BYTES字节"""
+        try:
+            with open(CONSOLE_LOG_FILE, 'rb') as f:
+                f.seek(max(offset, f.seek(0, os.SEEK_END) - CONSOLE_TAIL_BYTES))
+                return f.read().decode('utf-8', errors='replace').strip()
+        except OSError:
+            return ''
+
     def stop(self):
-        server_cfg = config.get_server_config()
+        server_cfg = self._server_cfg
         port = server_cfg['port']
         
-        # 首先尝试通过shutdown端点停止服务
-        try:
-            response = requests.post(f"http://127.0.0.1:{port}/shutdown", timeout=5)
-            if response.status_code == 200:
-                # 等待服务停止
-                for i in range(10):  # 最多等待10秒
-                    time.sleep(1)
-                    if not self.is_port_in_use(port):
-                        print("服务已停止")
-                        return True
-                print("服务停止超时")
-                return False
-        except (socket.timeout, ConnectionRefusedError, OSError, requests.exceptions.RequestException):
-            pass
-        
-        # 如果shutdown端点失败，尝试查找并终止进程
+        # 先用一次TCP连接探测端口，没有服务监听时无需查找进程
+        if not self.is_port_in_use(port, retries=1):
+            print("没有找到正在运行的服务")
+            return False
+
+        import psutil
+
+        # 服务没有shutdown端点，直接定位服务进程并终止
         proc = self.find_server_process(port)
+        self._server_proc = None  # 即将停止，缓存的进程不再有效
+
         if proc:
             try:
-                proc.terminate()
-                # 等待进程结束
-                try:
-                    proc.wait(timeout=5)
+                # 连同子进程（如debug模式下的reloader子进程）一起发送terminate，并发等待退出
+                procs = [proc] + proc.children(recursive=True)
+                for p in procs:
+                    try:
+                        p.terminate()
+                    except psutil.NoSuchProcess:
+                        pass
+                gone, alive = psutil.wait_procs(procs, timeout=5)
+                if not alive:
+                    self.remove_pid_file()  # terminate不会触发atexit，由这里清理
                     print("服务已停止")
                     return True
-                except psutil.TimeoutExpired:
-                    # 如果进程不响应terminate，强制杀死
-                    proc.kill()
-                    proc.wait(timeout=2)
-                    print("服务已强制停止")
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.TimeoutExpired) as e:
+
+                # 不响应terminate的进程批量强制杀死
+                for p in alive:
+                    try:
+                        p.kill()
+                    except psutil.NoSuchProcess:
+                        pass
+                gone, alive = psutil.wait_procs(alive, timeout=2)
+                if alive:
+                    print(f"无法停止进程: {', '.join(str(p.pid) for p in alive)}")
+                    return False
+                self.remove_pid_file()
+                print("服务已强制停止")
+                return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
                 print(f"无法停止进程: {e}")
                 return False
         
@@ -206,14 +358,12 @@ class ServiceManager:
         return False
 
     def status(self):
-        server_cfg = config.get_server_config()
-        try:
-            with socket.create_connection(('127.0.0.1', server_cfg['port']), timeout=0.5):
-                print(f"服务正在运行 (端口 {server_cfg['port']} 可用)")
-                return True
-        except (socket.timeout, ConnectionRefusedError, OSError):
-            print("服务未运行")
-            return False
+        server_cfg = self._server_cfg
+        if self.is_port_open_now(server_cfg['port'], timeout=0.5):
+            print(f"服务正在运行 (端口 {server_cfg['port']} 可用)")
+            return True
+        print("服务未运行")
+        return False
 
     def restart(self, args):
         print("正在重启服务...")
@@ -223,6 +373,15 @@ class ServiceManager:
         self.start(background=background)
 
 
+def _strip_stream_handlers(lg, streams=None):
+    """一次性移除logger上的StreamHandler；指定streams时只移除写入这些流的处理器"""
+    lg.handlers[:] = [
+        h for h in lg.handlers
+        if not (isinstance(h, logging.StreamHandler)
+                and (streams is None or getattr(h, 'stream', None) in streams))
+    ]
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='服务管理器')
@@ -230,29 +389,29 @@ def main():
     parser.add_argument('-b', '--background', action='store_true', help='以后台模式运行服务')
 
     args = parser.parse_args()
-    mgr = ServiceManager()
     command = args.command
+    # 先加载环境变量文件再读取配置，所有命令（包括后台run_server子进程）使用同一份端口/地址；
+    # status/stop只读取配置，不输出加载提示
+    ServiceManager.load_env_file(quiet=command in ('stop', 'status'))
+    mgr = ServiceManager()
 
     if command == 'start':
         mgr.start(background=args.background)
     elif command == 'run_server':
-        # 加载环境变量文件确保配置一致性
-        mgr.load_env_file()
         os.environ.setdefault('PYTHONIOENCODING', 'utf-8')
-        
+        from app.server import app, config as app_config, logger
+
         # 确保日志级别为INFO
         logger.logger.setLevel(logging.INFO)
         # 移除控制台处理器
-        for handler in logger.logger.handlers[:]:
-            if isinstance(handler, logging.StreamHandler) and handler.stream in (sys.stdout, sys.stderr):
-                logger.logger.removeHandler(handler)
+        _strip_stream_handlers(logger.logger, (sys.stdout, sys.stderr))
         # 处理werkzeug日志
         werkzeug_logger = logging.getLogger('werkzeug')
         werkzeug_logger.setLevel(logging.INFO)
-        for handler in werkzeug_logger.handlers[:]:
-            if isinstance(handler, logging.StreamHandler):
-                werkzeug_logger.removeHandler(handler)
-        server_cfg = config.get_server_config()
+        _strip_stream_handlers(werkzeug_logger)
+        server_cfg = app_config.get_server_config()
+        mgr.write_pid_file()
+        gc.freeze()  # 启动期创建的长生命周期对象移出GC跟踪，减少后续回收扫描
         app.run(host=server_cfg['host'], port=server_cfg['port'], debug=server_cfg['debug'])
     elif command == 'stop':
         mgr.stop()
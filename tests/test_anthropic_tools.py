@@ -7,6 +7,7 @@ Anthropic工具调用测试
 import unittest
 import json
 import time
+import socket
 import requests
 from pathlib import Path
 import sys
@@ -14,6 +15,12 @@ import sys
 # 添加父目录到路径以便导入模块
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from app import fast_json
+
+# 本地服务连接应在毫秒级完成，连接超时单独设短，服务未启动时快速失败；读超时留给上游模型响应
+CONNECT_TIMEOUT = 0.5
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, 30)
+
 class TestAnthropicTools(unittest.TestCase):
     """Anthropic工具调用测试类"""
 
@@ -25,18 +32,33 @@ class TestAnthropicTools(unittest.TestCase):
         cls.config = LiteConfig()
         cls.base_url = f"http://127.0.0.1:{cls.config.get_server_config()['port']}"
         cls.test_model = "claude-sonnet-4-5-20250929"  # 使用配置中的模型
+        # 所有用例复用同一个会话，保持与本地服务的长连接
+        cls.session = requests.Session()
+        cls.session.headers['Content-Type'] = 'application/json'
         
-        # 等待服务启动
-        time.sleep(1)
+        # 等待服务端口可连接（最多3秒），已在运行时无需固定等待
+        port = cls.config.get_server_config()['port']
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(0.1)
+                if s.connect_ex(('127.0.0.1', port)) == 0:
+                    break
+            time.sleep(0.05)
         
         # 验证服务可用
         try:
-            response = requests.get(f"{cls.base_url}/health", timeout=5)
+            response = cls.session.get(f"{cls.base_url}/health", timeout=(CONNECT_TIMEOUT, 5))
             if response.status_code != 200:
                 raise Exception("服务不可用")
         except Exception as e:
             raise Exception(f"无法连接到服务: {e}")
 
+    @classmethod
+    def tearDownClass(cls):
+        """关闭共享会话"""
+        cls.session.close()
+
     def test_tool_call_non_stream(self):
         """测试非流式工具调用"""
         request_data = {
@@ -72,11 +94,10 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": False
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         self.assertEqual(response.status_code, 200)
@@ -144,28 +165,27 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": True
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
             stream=True,
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         self.assertEqual(response.status_code, 200)
         
         # 验证流式响应格式
         events = []
-        for line in response.iter_lines():
+        # 直接在bytes上判断前缀，fast_json（orjson）可直接解析bytes，无需逐行解码
+        for line in response.iter_lines(chunk_size=8192):
             if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
+                if line.startswith(b'data: '):
                     data = line[6:]  # 移除 'data: ' 前缀
-                    if data != '[DONE]':
+                    if data != b'[DONE]':
                         try:
-                            event = json.loads(data)
+                            event = fast_json.loads(data)
                             events.append(event)
-                        except json.JSONDecodeError:
+                        except json.JSONDecodeError:  # orjson.JSONDecodeError是其子类
                             continue
         
         self.assertGreater(len(events), 0, "应该收到至少一个事件")
@@ -244,11 +264,10 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": False
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         self.assertEqual(response.status_code, 200)
@@ -277,11 +296,10 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": False
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         # 应该处理错误或返回有效响应
@@ -309,11 +327,10 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": False
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         self.assertEqual(response.status_code, 200)
@@ -356,11 +373,10 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": False
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         self.assertEqual(response.status_code, 200)
@@ -393,11 +409,10 @@ class TestAnthropicTools(unittest.TestCase):
             "stream": False
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/messages",
             json=request_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=REQUEST_TIMEOUT
         )
 
         # 应该能处理错误并返回有效响应
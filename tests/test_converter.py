@@ -0,0 +1,157 @@
+"""
+转换器单元测试
+测试LiteConverter的请求转换、上游响应的错误判断和停止原因转换
+"""
+
+import copy
+import unittest
+from pathlib import Path
+import sys
+
+# 添加父目录到路径以便导入模块
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.converter import LiteConverter
+
+
+def make_openai_response(**extra):
+    """构造最小的OpenAI非流式响应，extra中的字段覆盖到顶层"""
+    response = {
+        'id': 'chat-abc',
+        'model': 'test-model',
+        'choices': [{
+            'message': {'role': 'assistant', 'content': 'hello'},
+            'finish_reason': 'stop'
+        }],
+        'usage': {'prompt_tokens': 3, 'completion_tokens': 1}
+    }
+    response.update(extra)
+    return response
+
+
+class TestConvertRequest(unittest.TestCase):
+    """anthropic_to_openai请求转换测试"""
+
+    def test_request_not_mutated(self):
+        """转换只读取请求，同一请求字典重复转换结果一致"""
+        converter = LiteConverter()
+        anthropic_request = {
+            'model': 'claude-test',
+            'system': 'be brief',
+            'messages': [
+                {'role': 'user', 'content': [{'type': 'text', 'text': 'hi'}]},
+                {'role': 'assistant', 'content': [
+                    {'type': 'tool_use', 'id': 'toolu_1', 'name': 'calculator', 'input': {'expression': '1+1'}}
+                ]},
+                {'role': 'user', 'content': [
+                    {'type': 'tool_result', 'tool_use_id': 'toolu_1', 'content': '2'}
+                ]}
+            ],
+            'tools': [{'name': 'calculator', 'description': '计算', 'input_schema': {'type': 'object'}}],
+            'tool_choice': {'type': 'auto'}
+        }
+        original = copy.deepcopy(anthropic_request)
+
+        first = converter.anthropic_to_openai(anthropic_request)
+        second = converter.anthropic_to_openai(anthropic_request)
+
+        self.assertEqual(anthropic_request, original)
+        self.assertEqual(first, second)
+        self.assertEqual([m['role'] for m in first['messages']], ['system', 'user', 'assistant', 'tool'])
+
+
+class TestConvertResponseStatus(unittest.TestCase):
+    """convert_response的错误响应判断测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = LiteConverter()
+
+    def assertConverted(self, openai_response):
+        result = self.converter.convert_response(openai_response)
+        self.assertEqual(result['content'], [{'type': 'text', 'text': 'hello'}])
+        self.assertEqual(result['stop_reason'], 'end_turn')
+
+    def test_without_status(self):
+        """没有status字段时正常转换"""
+        self.assertConverted(make_openai_response())
+
+    def test_status_200(self):
+        """status为字符串或整数200时正常转换"""
+        self.assertConverted(make_openai_response(status='200'))
+        self.assertConverted(make_openai_response(status=200))
+
+    def test_empty_status(self):
+        """status为空值时视为未设置，与server.py的判断一致"""
+        for status in (None, 0, ''):
+            with self.subTest(status=status):
+                self.assertConverted(make_openai_response(status=status))
+
+    def test_error_status(self):
+        """status为非200时视为错误"""
+        for status in ('429', '449', 500):
+            with self.subTest(status=status):
+                with self.assertRaises(Exception):
+                    self.converter.convert_response(make_openai_response(status=status))
+
+    def test_missing_choices(self):
+        """没有choices时视为错误"""
+        with self.assertRaises(Exception):
+            self.converter.convert_response({'status': '200', 'msg': 'busy'})
+        with self.assertRaises(Exception):
+            self.converter.convert_response(make_openai_response(choices=[]))
+
+    def test_error_field(self):
+        """error字段非空时视为错误，为null时忽略"""
+        with self.assertRaises(Exception):
+            self.converter.convert_response(make_openai_response(error={'message': 'bad'}))
+        self.assertConverted(make_openai_response(error=None))
+
+
+class TestConvertResponseStopReason(unittest.TestCase):
+    """convert_response的stop_reason转换测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = LiteConverter()
+
+    def convert_message(self, message, finish_reason):
+        return self.converter.convert_response(make_openai_response(choices=[{
+            'message': message,
+            'finish_reason': finish_reason
+        }]))
+
+    def test_text_finish_reason_mapping(self):
+        """普通文本按finish_reason映射"""
+        message = {'role': 'assistant', 'content': 'hello'}
+        self.assertEqual(self.convert_message(message, 'stop')['stop_reason'], 'end_turn')
+        self.assertEqual(self.convert_message(message, 'length')['stop_reason'], 'max_tokens')
+
+    def test_tool_calls(self):
+        """tool_calls转换为tool_use内容，stop_reason为tool_use"""
+        message = {'role': 'assistant', 'tool_calls': [{
+            'id': 'call_1',
+            'type': 'function',
+            'function': {'name': 'calculator', 'arguments': '{"expression": "1+1"}'}
+        }]}
+        for finish_reason in ('tool_calls', 'stop'):
+            with self.subTest(finish_reason=finish_reason):
+                result = self.convert_message(message, finish_reason)
+                self.assertEqual(result['content'][0]['type'], 'tool_use')
+                self.assertEqual(result['content'][0]['input'], {'expression': '1+1'})
+                self.assertEqual(result['stop_reason'], 'tool_use')
+
+    def test_tools_parsed_from_text(self):
+        """从文本中解析出工具调用时，即使finish_reason为stop也返回tool_use"""
+        message = {
+            'role': 'assistant',
+            'content': '<function=calculator><parameter=expression>1+1</parameter></function>'
+        }
+        result = self.convert_message(message, 'stop')
+        self.assertEqual(result['content'][0]['type'], 'tool_use')
+        self.assertEqual(result['content'][0]['name'], 'calculator')
+        self.assertEqual(result['stop_reason'], 'tool_use')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -6,9 +6,12 @@ API服务器集成测试
 import unittest
 import json
 import time
+import socket
 import threading
+import http.server
 import requests
 from pathlib import Path
+from unittest import mock
 import sys
 
 # 添加父目录到路径以便导入模块
@@ -45,8 +48,16 @@ class TestAPIServer(unittest.TestCase):
         )
         cls.server_thread.start()
 
-        # 等待服务器启动
-        time.sleep(2)
+        # 等待服务器启动：端口可连接即继续，而不是固定睡眠，最多等待10秒
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(0.1)
+                if s.connect_ex(('127.0.0.1', 8081)) == 0:
+                    break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError("测试服务器未能在10秒内启动")
         cls.base_url = 'http://127.0.0.1:8081'  # unchanged, uses test thread
 
     def test_health_endpoint(self):
@@ -250,6 +261,110 @@ class TestAPIServer(unittest.TestCase):
             del os.environ['LOG_LEVEL']
 
 
+class TestModelsCache(unittest.TestCase):
+    """/v1/models上游响应缓存测试，上游请求和时钟均为模拟"""
+
+    MODELS_BODY = b'{"object": "list", "data": [{"id": "test-model", "object": "model"}]}'
+
+    @classmethod
+    def setUpClass(cls):
+        from app import server
+        cls.server = server
+        cls.client = server.app.test_client()
+
+    def setUp(self):
+        self.server._models_cache['body'] = None
+        self.server._models_cache['ts'] = 0.0
+        self.now = 1000.0
+
+        upstream_response = mock.Mock(status_code=200, content=self.MODELS_BODY)
+        get_patcher = mock.patch.object(self.server.upstream_session, 'get', return_value=upstream_response)
+        clock_patcher = mock.patch.object(self.server.time, 'monotonic', side_effect=lambda: self.now)
+        self.upstream_get = get_patcher.start()
+        clock_patcher.start()
+        self.addCleanup(get_patcher.stop)
+        self.addCleanup(clock_patcher.stop)
+        self.addCleanup(self.server._models_cache.update, {'body': None, 'ts': 0.0})
+
+    def get_models(self):
+        response = self.client.get('/v1/models')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.MODELS_BODY)
+        return response
+
+    def test_repeated_requests_use_one_upstream_call(self):
+        """缓存期内的重复请求只访问一次上游"""
+        for _ in range(3):
+            self.get_models()
+        self.assertEqual(self.upstream_get.call_count, 1)
+
+    def test_cache_expires_after_ttl(self):
+        """超过TTL后重新请求上游"""
+        self.get_models()
+        self.now += self.server.MODELS_CACHE_TTL - 1
+        self.get_models()
+        self.assertEqual(self.upstream_get.call_count, 1)
+
+        self.now += 1
+        self.get_models()
+        self.assertEqual(self.upstream_get.call_count, 2)
+
+    def test_config_update_clears_cache(self):
+        """POST /config后缓存失效，下次请求重新访问上游"""
+        self.get_models()
+        features = dict(self.server.config.get_features())
+        response = self.client.post(
+            '/config',
+            data=json.dumps({'features': features}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.server._models_cache['body'])
+
+        self.get_models()
+        self.assertEqual(self.upstream_get.call_count, 2)
+
+
+class TestUpstreamSession(unittest.TestCase):
+    """共享上游会话测试，使用本地HTTP服务模拟上游"""
+
+    @classmethod
+    def setUpClass(cls):
+        from app.server import upstream_session
+        cls.session = upstream_session
+        cls.received_cookies = received_cookies = []
+
+        class UpstreamHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                received_cookies.append(self.headers.get('Cookie'))
+                self.send_response(200)
+                self.send_header('Set-Cookie', 'affinity=worker-1; Path=/')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, format, *args):
+                pass
+
+        cls.upstream = http.server.ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+        threading.Thread(target=cls.upstream.serve_forever, daemon=True).start()
+        cls.upstream_url = f'http://127.0.0.1:{cls.upstream.server_port}/v1/models'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.shutdown()
+        cls.upstream.server_close()
+
+    def test_upstream_cookie_not_replayed(self):
+        """上游的Set-Cookie不会被保存并带到下一次请求"""
+        for _ in range(2):
+            response = self.session.get(self.upstream_url, timeout=5)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.received_cookies, [None, None])
+        self.assertEqual(len(self.session.cookies), 0)
+
+
 if __name__ == '__main__':
     # 运行测试
     unittest.main(verbosity=2)
\ No newline at end of file